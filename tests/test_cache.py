@@ -133,3 +133,15 @@ def test_restore_ids_with_filter_function(cache_db: Path) -> None:
         )
         == expected_values
     )
+
+
+def test_restore_cached_ids(cache_db: Path) -> None:
+    """Tests if every cached process' ID is restored, across fetch batches."""
+    from tj_scraper.cache import restore_cached_ids, save_to_cache
+
+    for process in MOCKED_TJRJ_BACKEND_DB.values():
+        save_to_cache(process, cache_db)
+
+    assert sorted(restore_cached_ids(cache_db, batch_size=2)) == sorted(
+        CNJ_IDS.values()
+    )
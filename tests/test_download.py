@@ -276,3 +276,27 @@ def test_download_processes_by_subject_with_empty_subject(
     processes = retrieve_data(results_sink)
 
     assert has_same_entries(processes, expected)
+
+
+def test_download_when_tj_is_unavailable(cache_db: Path, results_sink: Path) -> None:
+    """
+    Tests if server errors from TJ are neither cached nor written to sink, and
+    do not abort the download.
+    """
+    from tj_scraper.cache import load_all
+
+    combinations = CNJNumberCombinations(
+        1, 1, tj=TJ_INFO.tjs["rj"], year=2021, segment=JudicialSegment.JEDFT
+    )
+
+    with aioresponses() as mocked_aiohttp:  # type: ignore
+        mocked_aiohttp.post(TJ_INFO.tjs["rj"].cnj_endpoint, status=503, repeat=True)
+
+        discover_with_json_api(
+            combinations=combinations,
+            sink=results_sink,
+            cache_path=cache_db,
+        )
+
+    assert not retrieve_data(results_sink)
+    assert not load_all(cache_db)
@@ -0,0 +1,46 @@
+"""Tests export formats."""
+from copy import deepcopy
+from pathlib import Path
+
+import openpyxl
+
+from tj_scraper.export import export_to_xlsx, row_getter
+
+from .mock import MOCKED_TJRJ_BACKEND_DB
+
+
+def test_export_to_xlsx(tmp_path: Path) -> None:
+    """
+    Tests if exported XLSX contains a header row followed by one row per
+    process.
+    """
+    path = tmp_path / "processes.xlsx"
+
+    export_to_xlsx(deepcopy(list(MOCKED_TJRJ_BACKEND_DB.values())), path)
+
+    sheet = openpyxl.load_workbook(path).active
+    header, *rows = [
+        ["" if value is None else value for value in row]
+        for row in sheet.iter_rows(values_only=True)
+    ]
+
+    assert len(rows) == len(MOCKED_TJRJ_BACKEND_DB)
+    assert header == sorted(header)
+
+    numbers = [row[header.index("Número do Processo")] for row in rows]
+    assert numbers == [
+        process["codProc"] for process in MOCKED_TJRJ_BACKEND_DB.values()
+    ]
+
+    first = dict(zip(header, rows[0]))
+    assert first["Assunto"] == "Furto  (Art. 155 - CP)"
+    assert first["Advogado1Nome"] == "DEFENSOR PÚBLICO"
+    assert first["Autor do FatoNome"] == "EXEMPLO 1"
+
+
+def test_row_getter() -> None:
+    """Tests if rows are always fetched as tuples, even with a single key."""
+    row = {"a": "1", "b": None, "c": "3"}
+
+    assert row_getter(["a", "c"])(row) == ("1", "3")
+    assert row_getter(["b"])(row) == (None,)
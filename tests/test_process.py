@@ -10,6 +10,8 @@ from tj_scraper.process import (
     has_words_in_subject,
     make_cnj_number_str,
     number_or_range,
+    parse_cnj_number,
+    parse_sequential_number,
     to_cnj_number,
 )
 
@@ -42,6 +44,13 @@ def test_advance_process_number() -> None:
     assert advance(
         CNJProcessNumber(0, 2021, JudicialSegment.JEDFT, 2, units[-1].code), tj=TJRJ
     ) == CNJProcessNumber(1, 2021, JudicialSegment.JEDFT, 2, units[0].code)
+    assert (
+        advance(
+            CNJProcessNumber(999999, 2021, JudicialSegment.JEDFT, 2, units[-1].code),
+            tj=TJRJ,
+        )
+        is None
+    )
 
 
 def test_to_number_with_valid_input() -> None:
@@ -140,3 +149,49 @@ def test_process_has_words_in_subject() -> None:
     assert not has_words_in_subject(process, ["Homicídio"])
 
     assert has_words_in_subject(process, ["furto", "art"])
+
+
+def test_tj_by_code() -> None:
+    """Tests if TJs can be found by their TR code."""
+    from tj_scraper.process import TJ_INFO
+
+    assert TJ_INFO.tj_by_code(TJRJ.code) is TJRJ
+    assert TJ_INFO.tj_by_code(0) is None
+
+
+def test_to_number_with_invalid_separators() -> None:
+    """Tests if CNJ number separators are checked literally."""
+    from tj_scraper.errors import InvalidProcessNumber
+
+    with pytest.raises(InvalidProcessNumber):
+        to_cnj_number("0000000-11x2222.8.44.5555")
+
+
+def test_to_number_with_invalid_parts() -> None:
+    """Tests if CNJ numbers with wrong lengths or non-digit parts are refused."""
+    from tj_scraper.errors import InvalidProcessNumber
+
+    for process_id in [
+        "0000000-11.2222.8.44.555",
+        "0000000-11.2222.8.44.55555",
+        "000000a-11.2222.8.44.5555",
+        "+000000-11.2222.8.44.5555",
+        "0000000-11.2222.8.4 .5555",
+    ]:
+        with pytest.raises(InvalidProcessNumber):
+            to_cnj_number(process_id)
+        assert parse_cnj_number(process_id) is None
+        assert parse_sequential_number(process_id) is None
+
+    assert parse_sequential_number("0012345-11.2222.8.44.5555") == 12345
+
+
+def test_process_has_words_in_subject_with_special_characters() -> None:
+    """Tests if words are matched literally, even if they look like regexes."""
+    process = {
+        "txtAssunto": "Furto  (Art. 155 - CP)",
+    }
+
+    assert has_words_in_subject(process, ["(art. 155"])
+    assert not has_words_in_subject(process, ["art.*cp"])
+    assert not has_words_in_subject(process, [])
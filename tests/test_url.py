@@ -18,3 +18,9 @@ def test_build_url_with_parameters() -> None:
     assert build_url("a", {"b": 1}) == "a?b=1"
     assert build_url("a", {"b": 1, "c": "123"}) == "a?b=1&c=123"
     assert build_url("a?", {"b": 1}) == "a?b=1"
+
+
+def test_build_url_encodes_parameters() -> None:
+    """Tests if special characters in parameters are properly encoded."""
+    assert build_url("a", {"b": "x y&z=1"}) == "a?b=x+y%26z%3D1"
+    assert build_url("a?b=x+y%26z", {"c": "ç"}) == "a?b=x+y%26z&c=%C3%A7"
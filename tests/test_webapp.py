@@ -4,7 +4,7 @@
 # pyright: reportUnusedImport=false
 import json
 from pathlib import Path
-from typing import Generator
+from typing import Any, Generator
 
 import pytest
 from aioresponses import aioresponses
@@ -12,7 +12,7 @@ from flask import Flask
 from flask.testing import FlaskClient
 
 from tj_scraper.process import ProcessJSON
-from tj_scraper.webapp import make_webapp
+from tj_scraper.webapp import make_intervals, make_webapp
 
 from .fixtures import results_sink
 from .helpers import has_same_entries, ignore_unused, reverse_lookup
@@ -158,3 +158,172 @@ def test_request_two_non_overlapping_returns_only_wanted(client: FlaskClient) ->
     data = json.loads(response.data.decode("utf-8"))
 
     assert has_same_entries(data, expected)
+
+
+def test_download_as_jsonl(client: FlaskClient) -> None:
+    """Tests if downloading as JSON lines streams all data, one per line."""
+    expected = MOCKED_TJRJ_BACKEND_DB.values()
+
+    response = client.get(
+        "/buscar",
+        query_string={
+            "intervalo_inicio": "0000000",
+            "intervalo_fim": "0000004",
+            "assunto": "",
+            "ano": "2021",
+            "tipo_download": "jsonl",
+        },
+    )
+
+    assert response.mimetype == "application/x-ndjson"
+
+    data = [json.loads(line) for line in response.data.splitlines()]
+
+    assert has_same_entries(data, expected)
+
+
+def test_download_as_gzipped_json(
+    client: FlaskClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests if JSON downloads are gzipped when the client accepts it."""
+    import gzip
+
+    # Mocked data is smaller than what would be compressed by default.
+    monkeypatch.setattr("tj_scraper.webapp.MIN_GZIP_SIZE", 0)
+
+    expected = MOCKED_TJRJ_BACKEND_DB.values()
+
+    response = client.get(
+        "/buscar",
+        query_string={
+            "intervalo_inicio": "0000000",
+            "intervalo_fim": "0000004",
+            "assunto": "",
+            "ano": "2021",
+            "tipo_download": "json",
+        },
+        headers={"Accept-Encoding": "gzip"},
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+
+    data = json.loads(gzip.decompress(response.data))
+
+    assert has_same_entries(data, expected)
+
+
+def test_gzip_refused_with_zero_quality(
+    client: FlaskClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Tests if responses aren't gzipped when the client refuses it (q=0)."""
+    monkeypatch.setattr("tj_scraper.webapp.MIN_GZIP_SIZE", 0)
+
+    expected = MOCKED_TJRJ_BACKEND_DB.values()
+
+    response = client.get(
+        "/buscar",
+        query_string={
+            "intervalo_inicio": "0000000",
+            "intervalo_fim": "0000004",
+            "assunto": "",
+            "ano": "2021",
+            "tipo_download": "json",
+        },
+        headers={"Accept-Encoding": "gzip;q=0, identity"},
+    )
+
+    assert "Content-Encoding" not in response.headers
+
+    data = json.loads(response.data.decode("utf-8"))
+
+    assert has_same_entries(data, expected)
+
+
+def test_main_page_is_rendered_once_per_cache_version(
+    client: FlaskClient,
+    cache_db: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """
+    Tests if the main page is only rendered again once the cache changes, and
+    if its cached gzipped version is served to clients that accept it.
+    """
+    import gzip
+    import os
+
+    import tj_scraper.webapp
+
+    # Intervals file is written in the working directory.
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("tj_scraper.webapp.MIN_GZIP_SIZE", 0)
+
+    render_count = 0
+    render_template = tj_scraper.webapp.render_template
+
+    def counting_render_template(*args: Any, **kwargs: Any) -> str:
+        nonlocal render_count
+        render_count += 1
+        return render_template(*args, **kwargs)
+
+    monkeypatch.setattr("tj_scraper.webapp.render_template", counting_render_template)
+
+    client.get(
+        "/buscar",
+        query_string={
+            "intervalo_inicio": "0000000",
+            "intervalo_fim": "0000004",
+            "assunto": "",
+            "ano": "2021",
+            "tipo_download": "json",
+        },
+    )
+
+    first = client.get("/")
+
+    assert first.status_code == 200
+    assert render_count == 1
+    assert (tmp_path / "id_ranges.json").exists()
+    assert not list(tmp_path.glob("*.partial"))
+
+    second = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert render_count == 1
+    assert second.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(second.data) == first.data
+
+    stat = cache_db.stat()
+    os.utime(cache_db, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    third = client.get("/")
+
+    assert render_count == 2
+    assert third.data == first.data
+
+
+def test_invalid_arguments_are_refused(client: FlaskClient) -> None:
+    """Tests if non-integer inputs and unknown download types are refused."""
+    valid_args = {
+        "intervalo_inicio": "0000000",
+        "intervalo_fim": "0000004",
+        "assunto": "",
+        "ano": "2021",
+        "tipo_download": "json",
+    }
+
+    for field, value in [
+        ("intervalo_inicio", "abc"),
+        ("intervalo_fim", ""),
+        ("ano", "20a1"),
+        ("tipo_download", "csv"),
+    ]:
+        response = client.get("/buscar", query_string=valid_args | {field: value})
+
+        assert response.status_code == 400
+
+
+def test_make_intervals() -> None:
+    """Tests if intervals cover every known number, including the last one."""
+    assert make_intervals([5, 1, 2, 2, 7, 8]) == [(1, 2), (5, 5), (7, 8)]
+    assert make_intervals(iter([3])) == [(3, 3)]
+    assert not make_intervals([])
@@ -4,7 +4,7 @@ import sqlite3
 from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import Any, Callable, Mapping, Optional, Sequence
+from typing import Any, Callable, Iterator, Mapping, Optional, Sequence
 
 import jsonlines
 
@@ -41,6 +41,20 @@ class DBProcess:
     json: Mapping[str, Any]
 
 
+def connect(cache_path: Path) -> sqlite3.Connection:
+    """
+    Opens a connection to the cache database.
+
+    The database is put in WAL mode so the webapp can read while processes are
+    being cached, and with `synchronous = NORMAL` each cached process' commit
+    doesn't wait for an fsync (which is still done at checkpoints).
+    """
+    connection = sqlite3.connect(cache_path)
+    connection.execute("pragma journal_mode = WAL")
+    connection.execute("pragma synchronous = NORMAL")
+    return connection
+
+
 def create_database(path: Path) -> None:
     """Creates database file and its tables.
 
@@ -51,7 +65,7 @@ def create_database(path: Path) -> None:
     - subject: Quick-access to process's subject field.
     - json: Process data in JSON format as returned by TJ server.
     """
-    with sqlite3.connect(path) as connection:
+    with connect(path) as connection:
         cursor = connection.cursor()
         cursor.execute(
             """
@@ -70,7 +84,7 @@ def quickfix_db_id_to_real_id(cache_path: Path) -> None:
     """."""
     data = restore(cache_path)
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         cursor = connection.cursor()
         for item in data:
             cursor.execute(
@@ -117,13 +131,13 @@ def quickfix_db_id_to_cnj_id(cache_path: Path) -> None:
             print(f"Failed to use custom filter: {error}")
             raise
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         connection.create_function("is_invalid_number", 1, is_invalid_number)
         cursor = connection.cursor()
 
         cursor.execute("delete from Processos where is_invalid_number(json)")
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         connection.create_function("get_process_id", 1, _get_process_id)
         cursor = connection.cursor()
         cursor.execute(
@@ -133,7 +147,7 @@ def quickfix_db_id_to_cnj_id(cache_path: Path) -> None:
             """
         )
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         connection.create_function("get_process_subject", 1, get_process_subject)
         cursor = connection.cursor()
         cursor.execute(
@@ -159,7 +173,7 @@ def save_to_cache(
 
     item_db_id = get_process_id(item)
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         cursor = connection.cursor()
         cursor.execute(
             """
@@ -206,7 +220,7 @@ def restore_json_for_ids(
             print(f"Failed to use custom filter: {error}")
             raise
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         connection.create_function("is_in_list", 1, is_id_in_list)
         connection.create_function("custom_filter", 4, custom_filter)
         cursor = connection.cursor()
@@ -237,7 +251,7 @@ def restore(
     exclude_ids = exclude_ids or []
     with_subject = with_subject or []
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         cursor = connection.cursor()
 
         extra = ""
@@ -262,12 +276,28 @@ def restore(
     return []
 
 
+def restore_cached_ids(cache_path: Path, batch_size: int = 8192) -> Iterator[str]:
+    """
+    Yields the ID of every cached process. Only the `id` column is read, a
+    batch of rows at a time.
+    """
+    if not cache_path.exists():
+        raise FileNotFoundError(cache_path)
+
+    with connect(cache_path) as connection:
+        cursor = connection.execute("select id from Processos where id is not null")
+
+        while rows := cursor.fetchmany(batch_size):
+            for (id_,) in rows:
+                yield id_
+
+
 def load_most_common_subjects(cache_path: Path, n: int = 10) -> list[tuple[str, int]]:
     """Loads `n` most common subjects stored in cache and their count."""
     if not cache_path.exists():
         raise FileNotFoundError(cache_path)
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         cursor = connection.cursor()
 
         return list(cursor.execute(
@@ -309,7 +339,7 @@ def load_metadata(cache_path: Path) -> CacheMetadata:
     if not cache_path.exists():
         create_database(cache_path)
 
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         cursor = connection.cursor()
 
         states = {
@@ -385,7 +415,7 @@ def filter_cached(
 
 def load_all(cache_path: Path) -> list[tuple[str, str, str, dict[str, Any]]]:
     """Loads entire database content. For small DBs only (e.g. testing)."""
-    with sqlite3.connect(cache_path) as connection:
+    with connect(cache_path) as connection:
         cursor = connection.cursor()
 
         return [
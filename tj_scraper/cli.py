@@ -1,4 +1,5 @@
 """CLI part of the project. Interface should be in portuguese."""
+import logging
 from enum import Enum
 from pathlib import Path
 from typing import Optional
@@ -13,6 +14,21 @@ def make_app() -> Typer:
     """Creates CLI application."""
     app = Typer()
 
+    @app.callback()
+    def main(  # pylint: disable=unused-variable
+        verbose: bool = Option(
+            False,
+            "--verbose",
+            "-v",
+            help="Mostra também mensagens de depuração.",
+        ),
+    ) -> None:
+        """Baixa e exporta dados de processos dos portais dos TJs."""
+        logging.basicConfig(
+            level=logging.DEBUG if verbose else logging.INFO,
+            format="%(message)s",
+        )
+
     cache_cmd = Typer()
 
     @app.command()
@@ -129,16 +145,16 @@ def make_app() -> Typer:
             DownloadModes.JSON: discover_with_json_api,
         }[mode]
 
-        tj_by_code = {tj.code: name for name, tj in TJ_INFO.tjs.items()}
-
         if isinstance(number_range := number_or_range(id_range), CNJProcessNumber):
             number = number_range
+            tj = TJ_INFO.tj_by_code(number.tr_code)
+            assert tj is not None  # Already checked by `number_or_range`
             number_range = CNJNumberCombinations(
                 number.sequential_number,
                 number.sequential_number,
                 year=number.year,
                 segment=number.segment,
-                tj=TJ_INFO.tjs[tj_by_code[number.tr_code]],
+                tj=tj,
             )
 
         processes_by_subject(
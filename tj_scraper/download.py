@@ -1,14 +1,15 @@
 """Responsible for handling data downloading."""
 import asyncio
 import json
+import logging
 from collections.abc import Collection
 from dataclasses import dataclass
 from enum import Enum, auto
 from pathlib import Path
+from time import perf_counter
 from typing import Callable, Coroutine, Iterable, Sequence, TypedDict, TypeVar
 
 import aiohttp
-import jsonlines
 
 from .cache import (
     CacheState,
@@ -17,7 +18,7 @@ from .cache import (
     restore_json_for_ids,
     save_to_cache,
 )
-from .errors import UnknownTJResponse
+from .errors import TJUnavailable, UnknownTJResponse
 from .process import (
     REAL_ID_FIELD,
     TJ,
@@ -26,11 +27,13 @@ from .process import (
     JudicialSegment,
     ProcessJSON,
     get_process_id,
-    has_words_in_subject,
     make_cnj_number_str,
+    subject_filter,
 )
 from .timing import report_time
 
+logger = logging.getLogger(__name__)
+
 FilterFunction = Callable[[ProcessJSON], bool]
 DownloadFunction = Callable[[CNJNumberCombinations, Path, Path, FilterFunction], None]
 
@@ -38,6 +41,14 @@ DownloadFunction = Callable[[CNJNumberCombinations, Path, Path, FilterFunction],
 T = TypeVar("T")
 
 
+def accept_all(_: ProcessJSON) -> bool:
+    """
+    Default filter function: accepts every process. Callers may compare
+    against it by identity to skip the call entirely.
+    """
+    return True
+
+
 def chunks(
     iterable: Iterable[T], n: int  # pylint: disable=invalid-name
 ) -> Iterable[list[T]]:
@@ -61,13 +72,17 @@ def write_to_sink(items: Sequence[ProcessJSON], sink: Path, reason: str) -> None
     ids_to_print = [get_process_id(item) for item in items]
     if len(ids_to_print) > 20:
         ids_to_print = [ids_to_print[0], ids_to_print[1]]
-    with jsonlines.open(sink, "a") as output_f:
+    # Same format `jsonlines` writes, but serialized up front and written at
+    # once instead of with two writes per item.
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    lines = "".join(f"{encode(item)}\n" for item in items)
+    with open(sink, "a", encoding="utf-8") as output_f:
         print(
             f"Writing some ids\n"
             f"  -> Total items: {len(items)}.\n"
             f"  -> Reason: {reason}."
         )
-        output_f.write_all(items)
+        output_f.write(lines)
 
 
 def write_cached_to_sink(
@@ -87,7 +102,7 @@ def write_cached_to_sink(
     # print(f"{filtered=}")
 
     def cache_filter(item: DBProcess) -> bool:
-        return filter_function(item.json)
+        return filter_function is accept_all or filter_function(item.json)
 
     cached_items = restore_json_for_ids(
         cache_path,
@@ -107,6 +122,7 @@ class FetchFailReason(Enum):
     FILTERED = auto()
     INVALID = auto()
     NOT_FOUND = auto()
+    UNAVAILABLE = auto()
     UNSUPPORTED = auto()
 
 
@@ -148,15 +164,17 @@ def classify(
             for process in items:
                 assert not isinstance(process, str)
 
-                print(
-                    f"Fetched process {make_cnj_number_str(cnj_number)}:"
-                    f" {process.get('txtAssunto', 'Sem Assunto')}"
+                logger.info(
+                    "Fetched process %s: %s",
+                    make_cnj_number_str(cnj_number),
+                    process.get("txtAssunto", "Sem Assunto"),
                 )
                 return process
         case dict() as item if item.get("tipoProcesso", 1) == 1:
-            print(
-                f"Fetched process {make_cnj_number_str(cnj_number)}:"
-                f" {item.get('txtAssunto', 'Sem Assunto')}"
+            logger.info(
+                "Fetched process %s: %s",
+                make_cnj_number_str(cnj_number),
+                item.get("txtAssunto", "Sem Assunto"),
             )
             return item
 
@@ -179,6 +197,48 @@ def classify(
     #  'url': 'https://www3.tjrj.jus.br/ejud/ConsultaProcesso.aspx?N=2021.002.19959'}]
 
 
+async def read_response(response: aiohttp.ClientResponse) -> TJResponse:
+    """
+    Reads a TJ endpoint's response body as JSON. Server errors are raised as
+    `TJUnavailable` without reading/parsing the (useless) body.
+    """
+    if response.status >= 500:
+        raise TJUnavailable(f"{response.url} responded with {response.status}.")
+
+    # json.loads detects UTF-8/16/32 on its own, so there's no need to decode
+    # (and guess the charset of) the body first.
+    data: TJResponse = json.loads(await response.read())
+    return data
+
+
+# pylint: disable=invalid-name
+async def fetch_rj_request_params(
+    session: aiohttp.ClientSession,
+    cnj_number: CNJProcessNumber,
+    tj: TJ,
+) -> TJRequestParams | FetchFailReason:
+    """
+    TJRJ's main endpoint doesn't accept CNJ numbers, so the process' type and
+    TJRJ-specific number are first looked up through its `cnj_endpoint`.
+    """
+    request_args = TJRequestParams(
+        tipoProcesso="1", codigoProcesso=make_cnj_number_str(cnj_number)
+    )
+
+    async with session.post(tj.cnj_endpoint, json=request_args) as response:
+        raw_response = await read_response(response)
+
+    fetch_result = classify(raw_response, cnj_number, tj)
+
+    if isinstance(fetch_result, FetchFailReason):
+        return fetch_result
+
+    return TJRequestParams(
+        tipoProcesso=str(fetch_result.get("tipoProcesso")),
+        codigoProcesso=str(fetch_result.get("numProcesso")),
+    )
+
+
 # pylint: disable=invalid-name
 async def fetch_process(
     session: aiohttp.ClientSession,
@@ -194,44 +254,25 @@ async def fetch_process(
     # momentos variados: basta salvar o último "batch" (conjunto de NNNNNNN's,
     # DD's e OOOO's).
 
-    cnj_number_str = make_cnj_number_str(cnj_number)
-
-    request_args = TJRequestParams(tipoProcesso="1", codigoProcesso=cnj_number_str)
-
-    # cnj_endpoint
-    raw_response: TJResponse
+    request_args: TJRequestParams | FetchFailReason
     if tj.name == "rj":
-        async with session.post(
-            tj.cnj_endpoint,
-            json=request_args,
-            ssl=False,  # FIXME: Properly handle TJ's outdated certificate
-        ) as response:
-            raw_response = json.loads(await response.text())
-
-        fetch_result = classify(raw_response, cnj_number, tj)
-
-        if isinstance(fetch_result, FetchFailReason):
-            return fetch_result
+        request_args = await fetch_rj_request_params(session, cnj_number, tj)
 
+        if isinstance(request_args, FetchFailReason):
+            return request_args
+    else:
         request_args = TJRequestParams(
-            tipoProcesso=str(fetch_result.get("tipoProcesso")),
-            codigoProcesso=str(fetch_result.get("numProcesso")),
+            tipoProcesso="1", codigoProcesso=make_cnj_number_str(cnj_number)
         )
-    else:
-        request_args = TJRequestParams(tipoProcesso="1", codigoProcesso=cnj_number_str)
 
     # main_endpoint
-    async with session.post(
-        tj.main_endpoint,
-        json=request_args,
-        ssl=False,  # FIXME: Properly handle TJ's outdated certificate
-    ) as response:
-        raw_response = json.loads(await response.text())
+    async with session.post(tj.main_endpoint, json=request_args) as response:
+        raw_response = await read_response(response)
 
     return classify(raw_response, cnj_number, tj)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CNJNumberCombination:
     """A combination of values for a specific NNNNNNN value."""
 
@@ -255,24 +296,29 @@ def classify_and_cache(
 
     match fetch_result:
         case FetchFailReason.INVALID:
-            print(f"{cnj_number_str}: Invalid -- Cached now")
+            logger.debug("%s: Invalid -- Cached now", cnj_number_str)
             save_to_cache(
                 {REAL_ID_FIELD: cnj_number_str},
                 cache_path,
                 state=CacheState.INVALID,
             )
         case FetchFailReason.NOT_FOUND:
-            print(f"{cnj_number_str}: Not found -- Cached now")
+            logger.debug("%s: Not found -- Cached now", cnj_number_str)
             save_to_cache(
                 {REAL_ID_FIELD: cnj_number_str},
                 cache_path,
                 state=CacheState.INVALID,
             )
         case FetchFailReason.CAPTCHA:
-            print(f"{cnj_number_str}: Unfetched, failed on recaptcha.")
+            logger.warning("%s: Unfetched, failed on recaptcha.", cnj_number_str)
+        case FetchFailReason.UNAVAILABLE:
+            logger.warning(
+                "%s: Unfetched, TJ responded with a server error.", cnj_number_str
+            )
         case FetchFailReason.UNSUPPORTED:
-            print(
-                f"{cnj_number_str}: Unsupported 2nd instance process. Won't be cached."
+            logger.debug(
+                "%s: Unsupported 2nd instance process. Won't be cached.",
+                cnj_number_str,
             )
         case FetchFailReason.FILTERED:
             raise NotImplementedError(
@@ -282,11 +328,12 @@ def classify_and_cache(
 
             save_to_cache(process, cache_path, state=CacheState.CACHED)
 
-            if not filter_function(process):
-                subject = process.get("txtAssunto", "Sem Assunto")
-                print(
-                    f"{cnj_number_str}: Filtered"
-                    f" -- ({subject}) -- Cached now ({process=})"
+            if filter_function is not accept_all and not filter_function(process):
+                logger.debug(
+                    "%s: Filtered -- (%s) -- Cached now (process=%s)",
+                    cnj_number_str,
+                    process.get("txtAssunto", "Sem Assunto"),
+                    process,
                 )
                 return FetchFailReason.FILTERED
 
@@ -327,11 +374,14 @@ async def try_combinations(
         fetch_result = None
 
         for guess in test_range:
-            fetch_result = await fetch_process(
-                session,
-                guess,
-                tj=combination.tj,
-            )
+            try:
+                fetch_result = await fetch_process(
+                    session,
+                    guess,
+                    tj=combination.tj,
+                )
+            except TJUnavailable:
+                fetch_result = FetchFailReason.UNAVAILABLE
 
             fetch_result = classify_and_cache(
                 fetch_result, guess, cache_path, filter_function
@@ -361,7 +411,7 @@ async def run_batch(
     return await asyncio.gather(*batch)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class BatchSummary:
     """Summary of a batch execution."""
 
@@ -390,6 +440,45 @@ def summarize_batch_results(batch_results: Iterable[FetchResult]) -> BatchSummar
     )
 
 
+async def fetch_and_write_batches(
+    requests: Iterable[Coroutine[BatchArgs, BatchArgs, FetchResult]], sink: Path
+) -> int:
+    """
+    Runs requests in batches, writing each batch's processes to the sink, and
+    returns how many processes were found.
+
+    Each batch is written to the sink in a thread while the next batch is being
+    fetched. Writes still happen one at a time, in batch order.
+    """
+    total = 0
+    pending_write: asyncio.Task[None] | None = None
+    try:
+        for i, batch in enumerate(chunks(requests, 1000), start=1):
+            print(f"\n--\n-- Batch: {i}")
+            summary = summarize_batch_results(await run_batch(batch))
+
+            if pending_write is not None:
+                await pending_write
+            pending_write = asyncio.create_task(
+                asyncio.to_thread(
+                    write_to_sink,
+                    summary.processes,
+                    sink,
+                    reason=f"Fetched (Batch {i})",
+                )
+            )
+
+            print(
+                f"Partial result: {len(summary.processes)} processes downloaded"
+                f" ({summary.filtered} filtered, {summary.invalid} invalid)"
+            )
+            total += len(summary.processes)
+    finally:
+        if pending_write is not None:
+            await pending_write
+    return total
+
+
 async def discover_processes(
     sequential_numbers: list[int],
     year: int,
@@ -404,8 +493,15 @@ async def discover_processes(
     Discovers valid processes existing in a NNNNNNN interval and returns how
     many were found.
     """
-    total = 0
-    async with aiohttp.ClientSession(trust_env=True) as session:
+    # aiohttp's default pool (100 connections) would otherwise cap requests
+    # allowed by the semaphore; connections are kept alive between batches.
+    # TJ hosts are always the same, so DNS lookups are cached for a while.
+    connector = aiohttp.TCPConnector(
+        limit=batch_size,
+        ssl=False,  # FIXME: Properly handle TJ's outdated certificate
+        ttl_dns_cache=300,
+    )
+    async with aiohttp.ClientSession(connector=connector, trust_env=True) as session:
         semaphore = asyncio.Semaphore(value=batch_size)
         requests = (
             try_combinations(
@@ -417,25 +513,14 @@ async def discover_processes(
             )
             for number in sequential_numbers
         )
-        for i, batch in enumerate(chunks(requests, 1000), start=1):
-            print(f"\n--\n-- Batch: {i}")
-            summary = summarize_batch_results(await run_batch(batch))
-
-            write_to_sink(summary.processes, sink, reason=f"Fetched (Batch {i})")
-
-            print(
-                f"Partial result: {len(summary.processes)} processes downloaded"
-                f" ({summary.filtered} filtered, {summary.invalid} invalid)"
-            )
-            total += len(summary.processes)
-        return total
+        return await fetch_and_write_batches(requests, sink)
 
 
 def discover_with_json_api(
     combinations: CNJNumberCombinations,
     sink: Path,
     cache_path: Path,
-    filter_function: FilterFunction = lambda _: True,
+    filter_function: FilterFunction = accept_all,
     force_fetch: bool = False,
     batch_size: int = 100,
 ) -> None:
@@ -460,9 +545,7 @@ def discover_with_json_api(
             filter_function=filter_function,
         )
 
-    from time import time
-
-    start = time()
+    start = perf_counter()
     result = asyncio.run(
         discover_processes(
             not_cached_numbers,
@@ -475,7 +558,7 @@ def discover_with_json_api(
             batch_size=batch_size,
         )
     )
-    end = time()
+    end = perf_counter()
 
     total_items: int = result
     ellapsed = end - start
@@ -519,7 +602,7 @@ def download_all_with_ids(
     combinations: CNJNumberCombinations,
     sink: Path,
     cache_path: Path,
-    filter_function: FilterFunction = lambda _: True,
+    filter_function: FilterFunction = accept_all,
     download_function: DownloadFunction = discover_with_json_api,
 ) -> None:
     """
@@ -536,7 +619,7 @@ def download_all_from_range(
     number_range: CNJNumberCombinations,
     sink: Path,
     cache_path: Path,
-    filter_function: FilterFunction = lambda _: True,
+    filter_function: FilterFunction = accept_all,
     download_function: DownloadFunction = discover_with_json_api,
 ) -> None:
     """
@@ -556,8 +639,7 @@ def processes_by_subject(
 ) -> None:
     """Search for processes that contain the given words on its subject."""
 
-    def filter_function(item: ProcessJSON) -> bool:
-        return has_words_in_subject(item, list(words)) if words else True
+    filter_function: FilterFunction = subject_filter(words) if words else accept_all
 
     if words:
         print(f"Filtering by: {words}")
@@ -14,3 +14,10 @@ class BlockedByCaptcha(Exception):
 
 class UnknownTJResponse(Exception):
     """Thrown when a TJ endpoint responds with an unexpected/unknown content."""
+
+
+class TJUnavailable(Exception):
+    """
+    Thrown when a TJ endpoint responds with a server error (5xx), meaning the
+    request may succeed if retried later.
+    """
@@ -1,24 +1,45 @@
 """Deals with export formats."""
-from collections.abc import Collection
+import logging
+from collections.abc import Collection, Iterable, Iterator, Sequence
+from operator import itemgetter
 from pathlib import Path
-from typing import Mapping, TypeVar
+from typing import Callable, Mapping, TypeVar
 
 import openpyxl
 
 from .process import Object, ProcessJSON
 
+logger = logging.getLogger(__name__)
+
 Key = TypeVar("Key")
 Value = TypeVar("Value")
 
+# Process fields that are relevant for exporting. Everything else is dropped
+# before flattening.
+EXPORTED_FIELDS = frozenset(
+    {
+        "advogados",
+        "cidade",
+        "codCnj",
+        "codProc",
+        "dataDis",
+        "personagens",
+        "txtAssunto",
+        "uf",
+        "ultMovimentoProc",
+    }
+)
+
 
 def select_fields(
-    objects: Collection[Mapping[Key, Value]], fields: Collection[Key]
-) -> Collection[Mapping[Key, Value]]:
+    objects: Iterable[Mapping[Key, Value]], fields: Collection[Key]
+) -> Iterator[Mapping[Key, Value]]:
     """
-    Returns a new collection of mappign objects containing only fields described in
-    `fields.`
+    Yields new mapping objects containing only fields described in `fields`.
     """
-    return [{k: v for k, v in mapping.items() if k in fields} for mapping in objects]
+    kept = frozenset(fields)
+    for mapping in objects:
+        yield {k: mapping[k] for k in kept if k in mapping}
 
 
 def flatten(process_: ProcessJSON) -> dict[str, str]:
@@ -31,14 +52,14 @@ def flatten(process_: ProcessJSON) -> dict[str, str]:
     }
 
     # Relevant and already flat fields
-    print(process)
+    logger.debug("Raw process: %s", process)
     if not process:
         return {}
     result |= {
         "Número do Processo": str(process.pop("codProc")),
         "Assunto": str(process.get("txtAssunto", "Sem Assunto")),
     }
-    print(f"Flattening {result['Número do Processo']}")
+    logger.debug("Flattening %s", result["Número do Processo"])
 
     # Fields to split
     if "advogados" in process:
@@ -70,7 +91,7 @@ def flatten(process_: ProcessJSON) -> dict[str, str]:
         for personagem in process.pop("personagens"):  # type: ignore
             info = {
                 # "Código": personagem["codPers"],
-                "Nome": personagem["nome"],
+                "Nome": str(personagem["nome"]),
                 # "TipoPolo": personagem["tipoPolo"],
             }
             category = personagem["descPers"]
@@ -82,46 +103,61 @@ def flatten(process_: ProcessJSON) -> dict[str, str]:
     result["UltimoMovimentoDescricaoMov"] = str(ultimo_movimento.get("descrMov", ""))
     result["UltimoMovimentoDataMov"] = str(ultimo_movimento.get("dtMovimento", ""))
     result["UltimoMovimentoData"] = str(ultimo_movimento.get("dt", ""))
-    # print("=" * 80)
 
     # result |= {f"{k[0].upper()}{k[1:]}": str(v) for k, v in process.items()}
 
     return result
 
 
-def prepare_to_export(raw_data: Collection[ProcessJSON]) -> list[Object]:
-    """Rearranges data to be in a format easy to iter and export."""
-    raw_data = select_fields(
-        raw_data,
-        [
-            "advogados",
-            "cidade",
-            "codCnj",
-            "codProc",
-            "dataDis",
-            "personagens",
-            "txtAssunto",
-            "uf",
-            "ultMovimentoProc",
-        ],
-    )
-    data = [flatten(item) for item in raw_data]
-    return [item for item in data if item]
+def prepare_to_export(raw_data: Collection[ProcessJSON]) -> list[dict[str, str]]:
+    """
+    Rearranges data to be in a format easy to iter and export. All values are
+    already strings.
+    """
+    return [
+        flat
+        for item in select_fields(raw_data, EXPORTED_FIELDS)
+        if (flat := flatten(item))
+    ]
+
+
+Row = Mapping[str, str | None]
+
+
+def row_getter(keys: Sequence[str]) -> Callable[[Row], tuple[str | None, ...]]:
+    """
+    Makes a function that fetches all `keys` of a row at once, always as a
+    tuple (`itemgetter` with a single key returns the value itself).
+    """
+    if len(keys) == 1:
+        (key,) = keys
+        return lambda row: (row[key],)
+    getter: Callable[[Row], tuple[str | None, ...]] = itemgetter(*keys)
+    return getter
 
 
 def export_to_xlsx(raw_data: Collection[ProcessJSON], path: Path) -> None:
     """Exports data into a XLSX file."""
     data = prepare_to_export(raw_data)
 
-    book = openpyxl.Workbook()
+    # Write-only workbooks stream rows into the file instead of keeping a Cell
+    # object for every value in memory.
+    book = openpyxl.Workbook(write_only=True)
 
-    sheet = book.active
+    sheet = book.create_sheet()
 
     keys = sorted({key for process in data for key in process.keys()})
-    data = [{k: k for k in keys}, *data]
-
-    for row, process in enumerate(data, start=1):
-        for col, key in enumerate(keys, start=1):
-            sheet.cell(column=col, row=row, value=str(process.get(key, "")))
+    sheet.append(keys)
+
+    if keys:
+        # Every row is completed with `None`s so a single itemgetter can fetch
+        # all columns at once. Write-only sheets skip `None` values entirely,
+        # so missing fields don't even become (empty) cells.
+        empty_row: dict[str, str | None] = dict.fromkeys(keys)
+        get_row = row_getter(keys)
+
+        for process in data:
+            row: dict[str, str | None] = {**empty_row, **process}
+            sheet.append(get_row(row))
 
     book.save(path)
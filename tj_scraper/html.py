@@ -14,6 +14,13 @@ from .errors import BlockedByCaptcha, InvalidProcessNumber
 from .process import ProcessJSON
 from .url import build_tjrj_process_url
 
+CAPTCHA_XPATH = '//*[@id="container_captcha"]'
+ERROR_XPATH = "//title/text()"
+ID_XPATH = "//form/table/tbody/tr[3]/td[1]/h2/text()"
+# `$field_text` is bound on each call, so field names are never interpolated
+# into (and can't break) the expression.
+FIELD_XPATH = "//td[text()=$field_text]/following-sibling::td/text()"
+
 
 def check_for_captcha(
     process_id: str, response: TextResponse
@@ -21,9 +28,7 @@ def check_for_captcha(
     """
     Raises a `BlockedByCaptcha` if response page has a captcha on it.
     """
-    captcha_xpath = '//*[@id="container_captcha"]'
-
-    if response.xpath(captcha_xpath):
+    if response.xpath(CAPTCHA_XPATH):
         raise BlockedByCaptcha()
 
     return process_id, response
@@ -34,9 +39,8 @@ def check_for_valid_id(process_id: str, response: TextResponse) -> None:
     Raises an `BadProcessId` if response page is an error page stating the
     process_id is invalid
     """
-    error_xpath = "//title/text()"
     try:
-        h3_content = response.xpath(error_xpath).get().strip()
+        h3_content = response.xpath(ERROR_XPATH).get().strip()
     except AttributeError:
         return
 
@@ -56,8 +60,7 @@ def extract_process_id(response: TextResponse) -> str:
             return ""
 
     def assume_good_page() -> str:
-        xpath = "//form/table/tbody/tr[3]/td[1]/h2/text()"
-        return str(response.xpath(xpath)[1].get()).strip()
+        return str(response.xpath(ID_XPATH)[1].get()).strip()
 
     if _id := try_or_false(assume_good_page):
         return _id
@@ -67,17 +70,17 @@ def extract_process_id(response: TextResponse) -> str:
 
 def extract_field(response: TextResponse, field_text: str) -> str:
     """Extracts the value for a given process' field in page."""
-    field_xpath = f"//td[text()='{field_text}:']/following-sibling::td/text()"
-    return str(response.xpath(field_xpath).get()).strip()
+    return str(response.xpath(FIELD_XPATH, field_text=f"{field_text}:").get()).strip()
 
 
 def extract_page_content(response: TextResponse) -> tuple[str, str]:
     """
     Extracts page content. Raises exceptions if not a valid process page.
     """
-    process_id = extract_process_id(response)
+    # Captcha pages have no process ID, so don't bother looking for it there.
+    check_for_captcha("", response)
 
-    check_for_captcha(process_id, response)
+    process_id = extract_process_id(response)
     check_for_valid_id(process_id, response)
 
     try:
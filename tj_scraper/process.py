@@ -1,8 +1,21 @@
 """Related to a TJ's juridical process."""
-from dataclasses import dataclass
+import functools
+import re
+import sys
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import Callable, Iterator, Mapping, NamedTuple, Optional, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Union,
+)
 
 from .errors import InvalidProcessNumber
 
@@ -21,7 +34,7 @@ class JudicialSegment(Enum):
     JME = 9  # Justiça Militar dos Estados
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SourceUnit:
     """Abstraction for "Unidade de Origem"."""
 
@@ -38,6 +51,23 @@ class TJ:
     cnj_endpoint: str
     main_endpoint: str
     source_units: list[SourceUnit]
+    source_unit_codes: tuple[int, ...] = field(init=False, repr=False, compare=False)
+    source_unit_index: dict[int, int] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Just the codes of `source_units` (in the same order), so iterating
+        # through units doesn't need to touch the `SourceUnit` objects.
+        object.__setattr__(
+            self,
+            "source_unit_codes",
+            tuple(unit.code for unit in self.source_units),
+        )
+        # Maps a source unit code to its position in `source_units`.
+        object.__setattr__(
+            self,
+            "source_unit_index",
+            {code: i for i, code in enumerate(self.source_unit_codes)},
+        )
 
 
 @dataclass
@@ -45,12 +75,14 @@ class TJInfo:
     """General info about TJs."""
 
     tjs: Mapping[str, TJ]
+    _by_code: dict[int, TJ] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self._by_code = {tj.code: tj for tj in self.tjs.values()}
 
     def tj_by_code(self, code: int) -> TJ | None:
         """Searches which TJ has code `code`."""
-        tjs = [tj for tj in self.tjs.values() if tj.code == code]
-
-        return tjs[0] if tjs else None
+        return self._by_code.get(code)
 
 
 class CNJProcessNumber(NamedTuple):
@@ -98,18 +130,18 @@ class CNJNumberCombinations:
 
     def __iter__(self) -> Iterator[CNJProcessNumber]:
         """Iters through a process ID range."""
-        number: Optional[CNJProcessNumber] = CNJProcessNumber(
-            sequential_number=self.sequence_start,
-            year=self.year,
-            segment=self.segment,
-            tr_code=self.tj.code,
-            source_unit=self.tj.source_units[0].code,
-        )
+        year, segment, tr_code = self.year, self.segment, self.tj.code
+        source_unit_codes = self.tj.source_unit_codes
 
-        while number is not None and number.sequential_number <= self.sequence_end:
-            yield number
+        # Same sequence as repeatedly calling `advance`, which never goes past
+        # MAX_SEQUENTIAL_NUMBER (though always yields the starting number).
+        last = min(self.sequence_end, max(self.sequence_start, MAX_SEQUENTIAL_NUMBER))
 
-            number = advance(number, tj=self.tj)
+        for sequential_number in range(self.sequence_start, last + 1):
+            for source_unit in source_unit_codes:
+                yield CNJProcessNumber(
+                    sequential_number, year, segment, tr_code, source_unit
+                )
 
 
 Value = str
@@ -139,31 +171,79 @@ def get_process_id(process: ProcessJSON) -> str:
 
 def number_or_range(process_id: str) -> CNJNumberCombinations | CNJProcessNumber:
     """Evaluates a "<start>..<end>" or a "<process id>" string."""
-    start, *end = process_id.split("..")
+    start, separator, end = process_id.partition("..")
 
-    if len(end) > 1:
+    if ".." in end:
         raise ValueError(
             f'Invalid range format. Expected just one "..", got "{process_id}".'
         )
 
     start_number = to_cnj_number(start)
 
-    tjs = [tj for tj in TJ_INFO.tjs.values() if tj.code == start_number.tr_code]
+    tj = tj_info().tj_by_code(start_number.tr_code)
 
-    if not tjs:
+    if tj is None:
         raise ValueError(f"Unknown TR code '{start_number.tr_code}'.")
 
-    tj = tjs[0]
-
-    if end:
+    if separator:
         return CNJNumberCombinations(
             start_number.sequential_number,
-            to_cnj_number(end[0]).sequential_number,
+            to_cnj_number(end).sequential_number,
             tj,
             start_number.year,
             start_number.segment,
         )
-    return to_cnj_number(start)
+    return start_number
+
+
+SEGMENT_BY_DIGIT = {str(segment.value): segment for segment in JudicialSegment}
+
+
+def is_cnj_number_str(process_id: str) -> bool:
+    """Tells if `process_id` is in "NNNNNNN-DD.AAAA.J.TR.OOOO" format."""
+    # Every part has a fixed width and position, so it is checked by slicing
+    # instead of matching a regex.
+    return (
+        len(process_id) == 25
+        and process_id[7] == "-"
+        and process_id[10:21:5] == "..."  # Positions 10, 15 and 20
+        and process_id[17] == "."
+        and process_id[16] in SEGMENT_BY_DIGIT
+        and (
+            process_id[0:7]
+            + process_id[8:10]
+            + process_id[11:15]
+            + process_id[18:20]
+            + process_id[21:25]
+        ).isdecimal()
+    )
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_cnj_number(process_id: str) -> CNJProcessNumber | None:
+    """
+    Same as `to_cnj_number`, but returns `None` if `process_id` is not a valid
+    CNJ number instead of raising.
+    """
+    if not is_cnj_number_str(process_id):
+        return None
+
+    return CNJProcessNumber(
+        int(process_id[0:7]),
+        int(process_id[11:15]),
+        SEGMENT_BY_DIGIT[process_id[16]],
+        int(process_id[18:20]),
+        int(process_id[21:25]),
+    )
+
+
+def parse_sequential_number(process_id: str) -> int | None:
+    """
+    Parses just the sequential number (NNNNNNN) of a CNJ number, or returns
+    `None` if `process_id` is not a valid one. Cheaper than `parse_cnj_number`
+    when nothing else is needed.
+    """
+    return int(process_id[0:7]) if is_cnj_number_str(process_id) else None
 
 
 def to_cnj_number(process_id: str) -> CNJProcessNumber:
@@ -171,39 +251,51 @@ def to_cnj_number(process_id: str) -> CNJProcessNumber:
     Evaluates a single string into a CNJ process number. The digits part is
     unused and calculated automatically.
     """
-    import re
-
-    matched = re.fullmatch(r"(\d{7})-(\d{2}).(\d{4}).(\d).(\d{2})\.(\d{4})", process_id)
-
-    if matched is None:
+    if (number := parse_cnj_number(process_id)) is None:
         raise InvalidProcessNumber(
             f'A string "{process_id}" não corresponde a um número válido do CNJ.'
         )
+    return number
 
-    (number, _, year, segment, tr_code, source_unit) = map(int, matched.groups())
 
-    return CNJProcessNumber(
-        number, year, JudicialSegment(segment), tr_code, source_unit
-    )
+# "NNNNNNN-DD.AAAA.8.TR.OOOO". A single %-format is cheaper than an f-string
+# with one format spec per part.
+CNJ_NUMBER_FORMAT = "%07d-%02d.%04d.8.%02d.%04d"
 
 
+@functools.lru_cache(maxsize=4096)
 def make_cnj_number_str(number: CNJProcessNumber) -> str:
     """Creates a string in expected CNJ number format."""
-    return (
-        f"{number.sequential_number:07}"
-        f"-{number.digits:02}"
-        f".{number.year:04}"
-        f".8.{number.tr_code:02}"
-        f".{number.source_unit:04}"
+    return CNJ_NUMBER_FORMAT % (
+        number.sequential_number,
+        number.digits,
+        number.year,
+        number.tr_code,
+        number.source_unit,
     )
 
 
+# Weight of each field in the "NNNNNNNAAAAJTROOOO00" number used to calculate
+# the verification digits, reduced modulo 97 so every product stays small.
+NUMBER_WEIGHT = 10**13 % 97
+YEAR_WEIGHT = 10**9 % 97
+SEGMENT_WEIGHT = 10**8 % 97
+TR_CODE_WEIGHT = 10**6 % 97
+SOURCE_UNIT_WEIGHT = 10**2 % 97
+
+
 def calculate_digits(
     number: int, year: int, segment: JudicialSegment, tr_code: int, source_unit: int
 ) -> int:
     """Calculates verification digits for the given CNJ number fields."""
-    mixed = int(f"{number:07}{year:04}{segment.value}{tr_code:02}{source_unit:04}")
-    return 98 - (mixed * 100 % 97)
+    remainder = (
+        number * NUMBER_WEIGHT
+        + year * YEAR_WEIGHT
+        + segment.value * SEGMENT_WEIGHT
+        + tr_code * TR_CODE_WEIGHT
+        + source_unit * SOURCE_UNIT_WEIGHT
+    ) % 97
+    return 98 - remainder
 
 
 def make_cnj_number(
@@ -226,40 +318,27 @@ def make_cnj_number(
     )
 
 
+MAX_SEQUENTIAL_NUMBER = 999_999
+
+
 def next_source_unit(number: CNJProcessNumber, tj: TJ) -> Optional[CNJProcessNumber]:
     """Gets the next process number by advancing the 'source_unit' part."""
-    current_unit_index = [unit.code for unit in tj.source_units].index(
-        number.source_unit
-    )
-    try:
-        return make_cnj_number(
-            sequential_number=number.sequential_number,
-            year=number.year,
-            segment=number.segment,
-            tr_code=number.tr_code,
-            source_unit=tj.source_units[current_unit_index + 1].code,
-        )
-    except IndexError:
+    next_unit_index = tj.source_unit_index[number.source_unit] + 1
+
+    if next_unit_index >= len(tj.source_unit_codes):
         return None
 
+    return number._replace(source_unit=tj.source_unit_codes[next_unit_index])
+
 
 def next_number(number: CNJProcessNumber) -> Optional[CNJProcessNumber]:
     """Gets the next process number by advancing the 'number' part."""
     new_number = number.sequential_number + 1
 
-    if new_number >= 1000000:
+    if new_number > MAX_SEQUENTIAL_NUMBER:
         return None
 
-    return make_cnj_number(
-        sequential_number=new_number,
-        year=number.year,
-        segment=number.segment,
-        tr_code=number.tr_code,
-        source_unit=number.source_unit,
-    )
-
-
-ResetFunction = Callable[[CNJProcessNumber], CNJProcessNumber]
+    return number._replace(sequential_number=new_number)
 
 
 def advance(number: CNJProcessNumber, tj: TJ) -> Optional[CNJProcessNumber]:
@@ -267,53 +346,60 @@ def advance(number: CNJProcessNumber, tj: TJ) -> Optional[CNJProcessNumber]:
     Advances the process number into the next possible (not necessarily
     existing) process number.
     """
+    # Units can be ordered by [known] frequency, so testing digits for the most
+    # frequent unit might cut much more work.
+    if (new_number := next_source_unit(number, tj)) is not None:
+        return new_number
 
-    def reset_for(field: str) -> ResetFunction:
-        def zero_field(number: CNJProcessNumber) -> CNJProcessNumber:
-            number_as_dict = {
-                k: v for k, v in number._asdict().items() if k not in [field, "digits"]
-            }
+    return next_number(number._replace(source_unit=tj.source_unit_codes[0]))
 
-            number_as_dict[field] = 0
 
-            return make_cnj_number(**number_as_dict)
+def has_words_in_subject(data: ProcessJSON, words: list[str]) -> bool:
+    """Checks if data's subject field contains any of certains words."""
+    return subject_filter(words)(data)
 
-        return zero_field
 
-    # Units can be ordered by [known] frequency, so testing digits for the most
-    # frequent unit might cut much more work.
-    steps: list[
-        tuple[Callable[[CNJProcessNumber], CNJProcessNumber | None], ResetFunction]
-    ] = [
-        (lambda n: next_source_unit(n, tj), reset_for("source_unit")),
-        (next_number, reset_for("number")),
-    ]
+def subject_filter(words: Iterable[str]) -> Callable[[ProcessJSON], bool]:
+    """
+    Creates a filter that checks if a process' subject field contains any of
+    certain words.
+    """
+    words_tuple = tuple(words)
+    if not words_tuple:
+        return lambda _: False
 
-    for (step, reset) in steps:
-        new_number = step(number)
-        if new_number is not None:
-            return new_number
-        number = reset(number)
+    search_words = words_pattern(words_tuple).search
 
-    return None
+    def has_words(data: ProcessJSON) -> bool:
+        assunto = data.get("txtAssunto", "Sem Assunto")
+        if isinstance(assunto, list):
+            assunto = " ".join(map(str, assunto))
+        return search_words(assunto.lower()) is not None
 
+    return has_words
 
-def has_words_in_subject(data: ProcessJSON, words: list[str]) -> bool:
-    """Checks if data's subject field contains any of certains words."""
-    assunto = data.get("txtAssunto", "Sem Assunto")
-    if isinstance(assunto, list):
-        assunto = " ".join(map(str, assunto))
-    assunto = assunto.lower()
-    has = any(word.lower() in assunto for word in words)
-    return has
+
+@functools.lru_cache(maxsize=64)
+def words_pattern(words: tuple[str, ...]) -> re.Pattern[str]:
+    """
+    Compiles a single pattern matching any of the (lowercased) words, so a
+    subject is scanned once instead of once per word.
+    """
+    return re.compile("|".join(re.escape(word.lower()) for word in words))
 
 
 def load_tj_info(path: Path) -> TJInfo:
     """Loads a TOML file containing information about TJs."""
-    import toml
+    if sys.version_info >= (3, 11):
+        import tomllib
 
-    with open(path, encoding="utf-8") as f:
-        toml_contents = toml.load(f)
+        with open(path, "rb") as f:
+            toml_contents = tomllib.load(f)
+    else:
+        import toml
+
+        with open(path, encoding="utf-8") as f:
+            toml_contents = toml.load(f)
 
     return TJInfo(
         tjs={
@@ -335,5 +421,22 @@ def load_tj_info(path: Path) -> TJInfo:
     )
 
 
-TJ_INFO = load_tj_info(Path(__file__).parent / "tj_info.toml")
-TJRJ = TJ_INFO.tjs["rj"]
+@functools.cache
+def tj_info() -> TJInfo:
+    """Info about known TJs, loaded from `tj_info.toml` on first use."""
+    return load_tj_info(Path(__file__).parent / "tj_info.toml")
+
+
+if TYPE_CHECKING:
+    TJ_INFO: TJInfo
+    TJRJ: TJ
+
+
+def __getattr__(name: str) -> Any:
+    """Lazily provides `TJ_INFO` and `TJRJ`."""
+    match name:
+        case "TJ_INFO":
+            return tj_info()
+        case "TJRJ":
+            return tj_info().tjs["rj"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
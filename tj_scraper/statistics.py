@@ -2,9 +2,10 @@
 import cProfile
 import itertools
 import time
+from collections import defaultdict
 from contextlib import contextmanager
-from dataclasses import asdict, dataclass
-from functools import reduce
+from dataclasses import dataclass
+from functools import cache, reduce
 from pathlib import Path
 from pprint import pprint
 from pstats import SortKey, Stats
@@ -23,6 +24,7 @@ from typing import (
 
 import tj_scraper.download
 from tj_scraper.download import BatchArgs, FetchResult, discover_with_json_api
+from tj_scraper.download import run_batch as run_batch_async
 from tj_scraper.process import TJ_INFO, CNJNumberCombinations, JudicialSegment
 
 CACHE_PATH = Path("b.db")
@@ -48,12 +50,16 @@ class ProfileParamsSetup:
     batch_sizes: list[int]
 
     def __iter__(self) -> Iterator[ProfileParams]:
-        combinations = itertools.product(*list(asdict(self).values()))
-        for params in combinations:
-            param = ProfileParams(*params)
-            if not param.as_async and param.batch_size > 1:
-                continue
-            yield param
+        # Synchronous runs fetch one process at a time, so only batches of
+        # (at most) 1 make sense for them.
+        sync_batch_sizes = [size for size in self.batch_sizes if size <= 1]
+
+        for as_async in self.as_async:
+            batch_sizes = self.batch_sizes if as_async else sync_batch_sizes
+            for start, length, batch_size in itertools.product(
+                self.sequence_starts, self.sequence_lens, batch_sizes
+            ):
+                yield ProfileParams(as_async, start, length, batch_size)
 
 
 def download_function(params: ProfileParams) -> None:
@@ -90,14 +96,24 @@ def autodelete(path: Path) -> Generator[Path, None, None]:
 
 @contextmanager
 def no_stdout() -> Generator[None, None, None]:
-    """Stops output for stdout."""
+    """
+    Stops output for stdout. Redirection happens at file descriptor level, so
+    it also silences anything writing to fd 1 directly (e.g. C extensions).
+    """
     import os
     import sys
 
-    with open(os.devnull, "w") as devnull:  # pylint: disable=unspecified-encoding
-        old_stdout, sys.stdout = sys.stdout, devnull
+    sys.stdout.flush()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    old_stdout = os.dup(1)
+    os.dup2(devnull, 1)
+    try:
         yield
-        sys.stdout = old_stdout
+    finally:
+        sys.stdout.flush()
+        os.dup2(old_stdout, 1)
+        os.close(old_stdout)
+        os.close(devnull)
 
 
 def io_timer() -> float:
@@ -146,6 +162,51 @@ def profile(
     stats.print_stats(10)
 
 
+def sampling_profile(
+    params: ProfileParams,
+    output: Path,
+    keep_cache: bool = False,
+) -> None:
+    """
+    Profiles `download_function` with py-spy, a sampling profiler, so (unlike
+    cProfile) Python calls aren't slowed down by tracing. The download runs in
+    a new python process started by py-spy itself, so it is sampled from its
+    start and no permission to attach to a running process is needed. Output
+    is in speedscope format.
+    """
+    import subprocess
+    import sys
+
+    command = [
+        "py-spy",
+        "record",
+        "--rate",
+        "250",
+        "--format",
+        "speedscope",
+        "--output",
+        output.as_posix(),
+        "--",
+        sys.executable,
+        "-m",
+        "tj_scraper.statistics",
+        "run",
+        *map(str, params),
+    ]
+
+    output.unlink(missing_ok=True)
+    if keep_cache:
+        result = subprocess.run(command, check=False)
+    else:
+        with autodelete(CACHE_PATH):
+            result = subprocess.run(command, check=False)
+
+    if result.returncode != 0 or not output.exists():
+        raise RuntimeError(
+            f"py-spy failed (exit code {result.returncode}) to profile {params}."
+        )
+
+
 @dataclass
 class ProfileTimes:
     """Timing results of a profile."""
@@ -154,6 +215,18 @@ class ProfileTimes:
     network: float
 
 
+# Functions in which the event loop waits for network IO. Which of them shows up
+# depends on the selector used in the platform.
+NETWORK_IO_KEYS = frozenset(
+    {
+        "<method 'poll' of 'select.epoll' objects>",
+        "<method 'poll' of 'select.poll' objects>",
+        "<method 'control' of 'select.kqueue' objects>",
+        "<built-in method select.select>",
+    }
+)
+
+
 def view_profile(path: Path) -> ProfileTimes | None:
     """Shows previously profiled data."""
     print("👀 (início)")
@@ -167,27 +240,16 @@ def view_profile(path: Path) -> ProfileTimes | None:
     total_time = profile_stats.total_tt
     function_profiles = profile_stats.func_profiles
 
-    pprint(
-        [value for key, value in profile_stats.func_profiles.items() if "poll" in key]
-    )
-
-    network_io_keys = [
-        "<method 'poll' of 'select.epoll' objects>",
-        "<method 'poll' of 'select.poll' objects>",
-    ]
-
-    network_time = -1.0
-    for network_io_key in network_io_keys:
-        try:
-            network_function_profile = function_profiles[network_io_key]
-            pprint(network_function_profile)
-            network_time = network_function_profile.tottime
-        except KeyError:
-            pass
-    if network_time == -1:
+    found_network_io_keys = NETWORK_IO_KEYS & function_profiles.keys()
+    if not found_network_io_keys:
         print("Failed to get network time (now known poll function found).")
         return None
 
+    network_time = 0.0
+    for network_io_key in found_network_io_keys:
+        pprint(function_profiles[network_io_key])
+        network_time += function_profiles[network_io_key].tottime
+
     print(f"Total time: {total_time}")
     print(f"Network time: {network_time}")
     print(f"Non-Network time: {total_time - network_time}")
@@ -197,29 +259,30 @@ def view_profile(path: Path) -> ProfileTimes | None:
     return ProfileTimes(total=total_time, network=network_time)
 
 
+Batch = Coroutine[BatchArgs, BatchArgs, FetchResult]
+
+
+async def run_batch_sync(batch: Iterable[Batch]) -> Iterable[FetchResult]:
+    """
+    Runs a batch of coroutines one after another. Replaces
+    `tj_scraper.download.run_batch` to simulate synchronous downloads.
+    """
+    return [await coro for coro in batch]
+
+
 def profile_and_dump(
     function: Callable[[ProfileParams], None],
     timer: Timer | None,
     params_setup: ProfileParamsSetup,
     keep_cache: bool = False,
+    sampling: bool = False,
 ) -> None:
     """
     Profiles a function with a specific timer with a combination of different
-    parameters and dumps its result.
+    parameters and dumps its result. With `sampling`, py-spy is used instead
+    of cProfile (and `function` and `timer` are ignored, as it always profiles
+    `download_function`), dumping speedscope files.
     """
-    run_batch_async = getattr(tj_scraper.download, "run_batch")
-
-    Batch = Coroutine[BatchArgs, BatchArgs, FetchResult]
-
-    async def run_batch(
-        as_async: bool, batch: Iterable[Batch]
-    ) -> Iterable[FetchResult]:
-        if as_async:
-            return await run_batch_async(batch)
-        return [await coro for coro in batch]
-
-    from functools import partial
-
     for params in params_setup:
         print(f"⬇️ (início -- {params})")
         stats_path = make_stats_path(params)
@@ -227,13 +290,20 @@ def profile_and_dump(
         setattr(
             tj_scraper.download,
             "run_batch",
-            partial(run_batch, params.as_async),
+            run_batch_async if params.as_async else run_batch_sync,
         )
 
-        profile(function, timer, stats_path, keep_cache, params)
+        if sampling:
+            # Runs `download_function` in the profiled process, since functions
+            # can't be sent to another one.
+            stats_path = stats_path.with_suffix(".speedscope.json")
+            sampling_profile(params, stats_path, keep_cache)
+        else:
+            profile(function, timer, stats_path, keep_cache, params)
         print("⬇️ (fim -- {stats_path.as_posix()})")
 
 
+@cache
 def make_stats_path(params: ProfileParams) -> Path:
     """
     Creates a standardized path for the output file of profiles according to
@@ -250,15 +320,11 @@ Object = dict[Any, Any]
 
 def group_by(mappings: list[dict[Any, Any]], field: Any) -> dict[Any, Any]:
     """Groups mappings by a specific field into a single mapping."""
-    grouped: dict[Any, Any] = {}
+    grouped: defaultdict[Any, list[dict[Any, Any]]] = defaultdict(list)
     for profile_result in mappings:
         new_entry = {k: v for k, v in profile_result.items() if k != field}
-        key = profile_result[field]
-        try:
-            grouped[key] += [new_entry]
-        except KeyError:
-            grouped[key] = [new_entry]
-    return grouped
+        grouped[profile_result[field]].append(new_entry)
+    return dict(grouped)
 
 
 def aggregate(
@@ -271,14 +337,15 @@ def aggregate(
 
 def plot_csv(output: Path, csv_data: list[Object]) -> None:
     """Plots csv data into output."""
-    from csv import DictWriter
+    import csv
 
     with open(Path(output), "w", encoding="utf-8") as csvfile:
         fieldnames = list(csv_data[0].keys())
-        writer = DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for entry in csv_data:
-            writer.writerow(entry)
+        writer = csv.writer(csvfile)
+        writer.writerow(fieldnames)
+        writer.writerows(
+            [entry.get(field, "") for field in fieldnames] for entry in csv_data
+        )
 
 
 class GroupedInner(TypedDict):
@@ -444,6 +511,21 @@ def generate_sync_async_csv(profiles: list[Object], headers: dict[str, str]) ->
     plot_csv(Path("io_stats-sync-async.csv"), csv_data)
 
 
+def run_profiled_download(args: list[str]) -> None:
+    """
+    Runs a single download from its `ProfileParams` given as command line
+    arguments. Used by `sampling_profile` to run it under py-spy.
+    """
+    as_async, start, length, batch_size = args
+    params = ProfileParams(as_async == "True", int(start), int(length), int(batch_size))
+    setattr(
+        tj_scraper.download,
+        "run_batch",
+        run_batch_async if params.as_async else run_batch_sync,
+    )
+    download_function(params)
+
+
 def main() -> None:
     """Statistics generation."""
     params_setup = ProfileParamsSetup(
@@ -458,10 +540,16 @@ def main() -> None:
     import sys
 
     if len(sys.argv) == 1:
-        print(f"Usage: {sys.argv[0]} <dump | view | dump-cache | view-cache>")
+        print(
+            f"Usage: {sys.argv[0]}"
+            " <dump [--profiler=py-spy] | view | dump-cache | view-cache>"
+        )
 
     _, op, *args = sys.argv
 
+    if op == "run":
+        run_profiled_download(args)
+        return
     if op == "dump-cache":
         cache_op("dump", timer)
     if op == "view-cache":
@@ -476,7 +564,12 @@ def main() -> None:
 
         if input(f"Combinations: {combs}. Continue? (y/n)") == "n":
             return
-        profile_and_dump(download_function, timer, params_setup)
+        profile_and_dump(
+            download_function,
+            timer,
+            params_setup,
+            sampling="--profiler=py-spy" in args,
+        )
     if op == "view":
         headers = {
             "sequence_len": "Nº de processos",
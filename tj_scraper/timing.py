@@ -1,6 +1,6 @@
 """Time measurement utilities."""
 from dataclasses import dataclass
-from time import time
+from time import perf_counter
 from typing import Callable, Generic, ParamSpec, TypeVar
 
 Return = TypeVar("Return")
@@ -21,9 +21,9 @@ def timeit(
     """
     Runs a function and returns how much time in seconds it took to execute it.
     """
-    start = time()
+    start = perf_counter()
     result = function(*args, **kwargs)
-    end = time()
+    end = perf_counter()
 
     return Timed(result, end - start)
 
@@ -1,23 +1,15 @@
 """General tools for URL building."""
 from typing import Mapping
+from urllib.parse import parse_qsl, urlencode
 
 
 def build_url(page: str, params: Mapping[str, str | int]) -> str:
     """Builds URL with correct query string. For API purposes."""
-    page, *query_strings = page.split("?", maxsplit=1)
-    query_string = query_strings[0] if query_strings else ""
+    page, _, query_string = page.partition("?")
 
-    params = (
-        dict(
-            param_string.split("=", maxsplit=1)
-            for param_string in query_string.split("&")
-            if param_string
-        )
-        | params
-    )
-    query_string = "&".join(f"{p}={v}" for p, v in params.items())
+    params = dict(parse_qsl(query_string, keep_blank_values=True)) | dict(params)
 
-    return f"{page}?{query_string}"
+    return f"{page}?{urlencode(params)}"
 
 
 def build_tjrj_process_url(process_id: str) -> str:
@@ -1,22 +1,24 @@
 """A web application front/backend for the library's operations."""
+import gzip
+import logging
+import os
+import re
 from dataclasses import dataclass
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Union
+from typing import Callable, Iterable, Union
 
 from flask import Flask, jsonify, render_template, request, send_file
 from flask.wrappers import Response as FlaskResponse
 from werkzeug.wrappers.response import Response as WerkzeugResponse
 
-from .cache import jsonl_reader, restore, load_most_common_subjects
-from .errors import InvalidProcessNumber
+from .cache import jsonl_reader, load_most_common_subjects, restore_cached_ids
 from .process import (
     TJRJ,
     CNJNumberCombinations,
-    CNJProcessNumber,
     JudicialSegment,
     ProcessJSON,
-    to_cnj_number,
+    parse_sequential_number,
 )
 from tj_scraper.download import (
     discover_with_json_api,
@@ -24,8 +26,16 @@ from tj_scraper.download import (
     processes_by_subject,
 )
 
+logger = logging.getLogger(__name__)
+
 Response = Union[str, tuple[str | FlaskResponse | WerkzeugResponse, int]]
 
+# Result sinks and exported files only live during a request, so they are kept
+# in memory (tmpfs) when available, unless TMPDIR is explicitly set.
+TEMP_DIR = (
+    "/dev/shm" if "TMPDIR" not in os.environ and os.path.isdir("/dev/shm") else None
+)
+
 # TODO #1: Mostrar uma tabela com intervalos (pré-definidos) de IDs e habilitar
 # salvar esses intervalos.
 #
@@ -46,35 +56,91 @@ Response = Union[str, tuple[str | FlaskResponse | WerkzeugResponse, int]]
 # sobrecarregar o servidor só para mostrar alguns processos.
 
 
-def make_intervals(known_ids: list[CNJProcessNumber]) -> list[tuple[int, int]]:
+def make_intervals(sequential_numbers: Iterable[int]) -> list[tuple[int, int]]:
     """
-    Creates a list of (start, end) intervals of sequential IDs in `known_ids`.
+    Creates a list of (start, end) intervals of known sequential numbers.
     """
-    known_ids = sorted(known_ids)
+    numbers = sorted(set(sequential_numbers))
+
+    if not numbers:
+        return []
 
     intervals = []
-    start, *tail = known_ids
-    end = start
-    for id_ in tail:
-        if id_.sequential_number > end.sequential_number + 1:
+    start = end = numbers[0]
+    for number in numbers[1:]:
+        if number > end + 1:
             intervals.append((start, end))
-            start = id_
-        end = id_
-    last = known_ids[-1]
-    if last != end:
-        intervals.append((start, last))
+            start = number
+        end = number
+    intervals.append((start, end))
 
-    return [
-        (start.sequential_number, end.sequential_number) for start, end in intervals
-    ]
+    return intervals
 
 
-def to_cnj_number_or_none(item: ProcessJSON) -> CNJProcessNumber | None:
-    """Tries to convert item's codCnj to CNJ Number and returns None if failed."""
-    try:
-        return to_cnj_number(str(item["codCnj"]))
-    except (InvalidProcessNumber, KeyError):
-        return None
+# Accepted values for /buscar's `tipo_download`.
+DOWNLOAD_TYPES = ("json", "jsonl", "xlsx")
+
+
+def invalid_download_type(download_type: str) -> Response:
+    """Refuses a `tipo_download` that is not one of `DOWNLOAD_TYPES`."""
+    expected = ", ".join(f'"{type_}"' for type_ in DOWNLOAD_TYPES)
+    return f"tipo_download should be one of {expected}, but it is {download_type}.", 400
+
+
+# Runs of characters that are replaced by "_" when a subject is used in a
+# download's filename: whitespace, slashes, quotes, parentheses and so on.
+UNSAFE_FILENAME_CHARACTERS = re.compile(r"[^\w.-]+")
+
+
+def modification_times(*paths: Path) -> tuple[int | None, ...]:
+    """Modification times (ns) of each path, or `None` for missing ones."""
+    times: list[int | None] = []
+    for path in paths:
+        try:
+            times.append(path.stat().st_mtime_ns)
+        except FileNotFoundError:
+            times.append(None)
+    return tuple(times)
+
+
+# Responses smaller than this aren't worth compressing.
+MIN_GZIP_SIZE = 1024
+
+
+def accepts_gzip() -> bool:
+    """
+    Whether the current request accepts gzip. A quality of 0 (`gzip;q=0`) means
+    the client refuses it, even though it is listed.
+    """
+    return request.accept_encodings["gzip"] > 0
+
+
+def gzipped_response(data: bytes) -> FlaskResponse:
+    """Responds with already gzipped (HTML) data."""
+    response = FlaskResponse(data, mimetype="text/html")
+    response.headers["Content-Encoding"] = "gzip"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def gzip_response(response: FlaskResponse) -> FlaskResponse:
+    """
+    Compresses buffered responses with gzip if the client accepts it. Streamed
+    responses and files (XLSX are already compressed) are sent as they are.
+    """
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or "Content-Encoding" in response.headers
+        or (response.content_length or 0) < MIN_GZIP_SIZE
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    if accepts_gzip():
+        response.set_data(gzip.compress(response.get_data(), compresslevel=5))
+        response.headers["Content-Encoding"] = "gzip"
+    return response
 
 
 @dataclass(frozen=True)
@@ -85,22 +151,27 @@ class DownloadRequest:
     download_type: str
 
 
+def download_processes(request: DownloadRequest, sink_file: Path) -> None:
+    """Downloads the requested processes into `sink_file` as JSON lines."""
+    if request.subject is not None:
+        processes_by_subject(
+            request.number_combinations,
+            words=[request.subject],
+            download_function=discover_with_json_api,
+            output=sink_file,
+            cache_path=request.cache_path,
+        )
+    else:
+        download_all_from_range(
+            request.number_combinations, sink_file, cache_path=request.cache_path
+        )
+
+
 def get_processes(request: DownloadRequest) -> list[ProcessJSON]:
-    with NamedTemporaryFile() as sink:
+    with NamedTemporaryFile(dir=TEMP_DIR) as sink:
         sink_file = Path(sink.name)
 
-        if request.subject is not None:
-            processes_by_subject(
-                request.number_combinations,
-                words=[request.subject],
-                download_function=discover_with_json_api,
-                output=sink_file,
-                cache_path=request.cache_path,
-            )
-        else:
-            download_all_from_range(
-                request.number_combinations, sink_file, cache_path=request.cache_path
-            )
+        download_processes(request, sink_file)
 
         sink.seek(0)
 
@@ -108,6 +179,30 @@ def get_processes(request: DownloadRequest) -> list[ProcessJSON]:
             return list(sink_f)
 
 
+def stream_processes(request: DownloadRequest) -> Response:
+    """
+    Responds with the downloaded processes as JSON lines, streamed straight
+    from the sink file instead of being loaded and serialized again.
+    """
+    # pylint: disable=consider-using-with
+    sink = NamedTemporaryFile(dir=TEMP_DIR)
+    try:
+        download_processes(request, Path(sink.name))
+    except BaseException:
+        sink.close()
+        raise
+
+    if os.fstat(sink.fileno()).st_size == 0:
+        sink.close()
+        return "Nenhum dado retornado."
+
+    sink.seek(0)
+
+    response = FlaskResponse(iter(sink), mimetype="application/x-ndjson")
+    response.call_on_close(sink.close)
+    return response, 200
+
+
 def export_file(
     request: DownloadRequest,
     data: list[ProcessJSON],
@@ -116,7 +211,7 @@ def export_file(
         case "json":
             return jsonify(data), 200
         case "xlsx":
-            suffix = "_".join(request.subject.split())
+            suffix = UNSAFE_FILENAME_CHARACTERS.sub("_", request.subject).strip("_")
             params = map(str, [
                 "Processos-TJ",
                 request.number_combinations.sequence_start,
@@ -124,17 +219,14 @@ def export_file(
                 suffix,
             ])
             filename = f'{"-".join(params)}.xlsx'
-            with NamedTemporaryFile() as xlsx_file:
+            with NamedTemporaryFile(dir=TEMP_DIR) as xlsx_file:
                 from tj_scraper.export import export_to_xlsx
 
                 export_to_xlsx(data, Path(xlsx_file.name))
                 xlsx_file.seek(0)
                 return send_file(xlsx_file.name, attachment_filename=filename), 200
         case _:
-            return (
-                f'tipo_download should be "json" or "xlsx", but it is {request.download_type}.',
-                300,
-            )
+            return invalid_download_type(request.download_type)
 
 
 def make_webapp(cache_path: Path) -> Flask:
@@ -142,41 +234,106 @@ def make_webapp(cache_path: Path) -> Flask:
     # pylint: disable=redefined-outer-name
     # pylint: disable=too-many-statements
     app = Flask(__name__)
+    app.after_request(gzip_response)
     # from tj_scraper.cache import quickfix_db_id_to_real_id
     # quickfix_db_id_to_real_id(cache_path)
     # from tj_scraper.cache import quickfix_db_id_to_cnj_id
     # quickfix_db_id_to_cnj_id(cache_path)
     # from tj_scraper.timing import report_time
 
+    # Intervals by the file they were loaded from, along with its mtime (ns), so
+    # they are only loaded again once that file changes.
+    loaded_intervals: dict[Path, tuple[int, list[tuple[int, int]]]] = {}
+
+    def load_intervals(
+        path: Path, load: Callable[[], list[tuple[int, int]]]
+    ) -> list[tuple[int, int]]:
+        mtime = path.stat().st_mtime_ns
+        cached = loaded_intervals.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        intervals = load()
+        loaded_intervals[path] = (mtime, intervals)
+        return intervals
+
+    # The main page only changes along with the intervals file or the cache
+    # (intervals and most common subjects), so it is rendered once per version
+    # of them. In WAL mode, cache writes only reach the database file itself at
+    # checkpoints, so the WAL file is checked too. Its gzipped version is kept
+    # along with it, so it isn't compressed again on every request.
+    rendered_main_page: dict[tuple[int | None, ...], tuple[str, bytes | None]] = {}
+
+    def main_page_response(page: str, gzipped_page: bytes | None) -> Response:
+        if gzipped_page is not None and accepts_gzip():
+            return gzipped_response(gzipped_page), 200
+        return page
+
     @app.route("/")
     def _root() -> Response:
         import json
 
         range_files = Path("id_ranges.json")
-        print("Loading known ids")
-        if range_files.exists():
-            print("Loading predefined intervals...")
+        version = modification_times(
+            range_files, cache_path, cache_path.with_name(f"{cache_path.name}-wal")
+        )
+        if (cached := rendered_main_page.get(version)) is not None:
+            return main_page_response(*cached)
+
+        def load_predefined_intervals() -> list[tuple[int, int]]:
+            logger.debug("Loading predefined intervals...")
             with open(range_files, encoding="utf-8") as file_:
-                intervals = json.load(file_)
-        elif cache_path.exists():
-            known_ids = [
+                intervals: list[tuple[int, int]] = json.load(file_)
+            return intervals
+
+        def load_cached_intervals() -> list[tuple[int, int]]:
+            logger.debug("Loading known ids")
+            known_numbers = (
                 number
-                for item in restore(cache_path)
-                if (number := to_cnj_number_or_none(item)) is not None
-            ]
-            print("Making intervals...")
-            intervals = make_intervals(known_ids)
-            with open(range_files, "w", encoding="utf-8") as file_:
+                for id_ in restore_cached_ids(cache_path)
+                if (number := parse_sequential_number(id_)) is not None
+            )
+            logger.debug("Making intervals...")
+            intervals = make_intervals(known_numbers)
+            # Written aside and then moved, so concurrent requests never load a
+            # partially written file. Each request writes its own file, so
+            # concurrent ones don't move each other's away.
+            with NamedTemporaryFile(
+                "w",
+                encoding="utf-8",
+                dir=range_files.parent,
+                suffix=".partial",
+                delete=False,
+            ) as file_:
                 json.dump(intervals, file_)
+            os.replace(file_.name, range_files)
+            loaded_intervals[range_files] = (range_files.stat().st_mtime_ns, intervals)
+            return intervals
+
+        if range_files.exists():
+            intervals = load_intervals(range_files, load_predefined_intervals)
+        elif cache_path.exists():
+            intervals = load_intervals(cache_path, load_cached_intervals)
+            # Intervals built from the cache are written to the intervals file,
+            # so the page belongs to that file's new version.
+            version = (*modification_times(range_files), *version[1:])
         else:
-            print("No cache file found. No intervals then...")
+            logger.debug("No cache file found. No intervals then...")
             intervals = []
         subjects = load_most_common_subjects(cache_path)
-        return render_template("mainpage.html", intervals=intervals, subjects=subjects)
+        page = render_template("mainpage.html", intervals=intervals, subjects=subjects)
+        encoded_page = page.encode("utf-8")
+        gzipped_page = (
+            gzip.compress(encoded_page, compresslevel=5)
+            if len(encoded_page) >= MIN_GZIP_SIZE
+            else None
+        )
+        rendered_main_page.clear()
+        rendered_main_page[version] = (page, gzipped_page)
+        return main_page_response(page, gzipped_page)
 
     @app.route("/buscar", methods=["GET"])
     def _search() -> Response:
-        # pylint: disable=too-many-locals
+        # pylint: disable=too-many-locals,too-many-return-statements
         start_arg = request.args.get("intervalo_inicio")
         end_arg = request.args.get("intervalo_fim")
 
@@ -190,29 +347,43 @@ def make_webapp(cache_path: Path) -> Flask:
         if year_arg is None:
             return "Year must not be empty.", 400
 
-        year_arg = year_arg.lstrip("0")
+        try:
+            start, end, year = int(start_arg), int(end_arg), int(year_arg)
+        except ValueError:
+            return (
+                "Start, end and year must be integers:"
+                f" {start_arg=}, {end_arg=}, {year_arg=}.",
+                400,
+            )
+
+        download_type = request.args.get("tipo_download", "")
+        if download_type not in DOWNLOAD_TYPES:
+            return invalid_download_type(download_type)
 
         number_combinations = CNJNumberCombinations(
-            int(start_arg),
-            int(end_arg),
+            start,
+            end,
             tj=TJRJ,
             segment=JudicialSegment.JEDFT,
-            year=int(year_arg),
+            year=year,
         )
         subject = request.args.get("assunto-predef", "")
-        print(f"{subject=}")
+        logger.debug("subject=%r", subject)
 
         if subject == "Sem Assunto":
             subject = request.args.get("assunto-outro", "")
-            print(f"Changed: {subject=}")
+            logger.debug("Changed: subject=%r", subject)
 
         download_request = DownloadRequest(
             number_combinations=number_combinations,
             subject=subject,
             cache_path=cache_path,
-            download_type=request.args.get("tipo_download", ""),
+            download_type=download_type,
         )
 
+        if download_request.download_type == "jsonl":
+            return stream_processes(download_request)
+
         data = get_processes(download_request)
 
         if not data: